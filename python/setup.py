@@ -1,8 +1,4 @@
 from setuptools import setup, find_packages
-from collections import defaultdict
-
-
-extra_packages = defaultdict(list)
 
 
 def _is_requirement(line):
@@ -11,22 +7,14 @@ def _is_requirement(line):
     return line and not (line.startswith("-r") or line.startswith("#"))
 
 
-def _read_requirements(filename, extra_packages):
-    """Returns a list of package requirements read from the file."""
-    requirements_file = open(filename).read()
+def _read_requirements(filename):
+    """Returns a list of package requirements read from the file. Environment markers are kept as-is."""
+    with open(filename) as requirements_file:
+        return [line.strip() for line in requirements_file.read().splitlines() if _is_requirement(line)]
 
-    hard_requirements = []
-    for line in requirements_file.splitlines():
-        if _is_requirement(line):
-            if line.find(';') > -1:
-                dep, condition = tuple(line.split(';'))
-                extra_packages[condition.strip()].append(dep.strip())
-            else:
-                hard_requirements.append(line.strip())
-    return hard_requirements, extra_packages
 
-required_packages, extra_packages = _read_requirements("requirements/base.txt", extra_packages)
-test_packages, extra_packages = _read_requirements("requirements/tests.txt", extra_packages)
+required_packages = _read_requirements("requirements/base.txt")
+test_packages = _read_requirements("requirements/tests.txt")
 
 setup(
     name='rapidpro-expressions',
@@ -49,9 +37,9 @@ setup(
 
     keywords='rapidpro templating',
     packages=find_packages(),
+    python_requires='>=3.7',
     package_data={'temba_expressions': ['month.aliases']},
     install_requires=required_packages,
-    extra_packages=extra_packages,
     test_suite='nose.collector',
     tests_require=required_packages + test_packages,
 )
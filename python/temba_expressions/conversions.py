@@ -2,26 +2,50 @@ import datetime
 
 from decimal import Decimal, ROUND_HALF_UP
 from . import EvaluationError
+from .utils import DECIMAL_ZERO, DECIMAL_ONE
+
+
+# the value types we can convert, with subclasses checked in this order so that bool comes before int and datetime
+# before date
+_VALUE_TYPES = (bool, int, Decimal, str, datetime.datetime, datetime.date, datetime.time)
+_VALUE_TYPES_SET = frozenset(_VALUE_TYPES)
+
+_NUMERIC_TYPES = frozenset((bool, int, Decimal))
+
+
+def _value_type(value):
+    """
+    Gets the supported type of the given value, so that subclasses of supported types are converted like their base
+    type, or None if the value isn't of a supported type
+    """
+    for value_type in _VALUE_TYPES:
+        if isinstance(value, value_type):
+            return value_type
+    return None
 
 
 def to_boolean(value, ctx):
     """
     Tries conversion of any value to a boolean
     """
-    if isinstance(value, bool):
+    value_type = type(value)
+    if value_type not in _VALUE_TYPES_SET:
+        value_type = _value_type(value)
+
+    if value_type is bool:
         return value
-    elif isinstance(value, int):
+    elif value_type is int:
         return value != 0
-    elif isinstance(value, Decimal):
-        return value != Decimal(0)
-    elif isinstance(value, str):
+    elif value_type is Decimal:
+        return value != DECIMAL_ZERO
+    elif value_type is str:
         value = value.lower()
         if value == 'true':
             return True
         elif value == 'false':
             return False
-    elif isinstance(value, datetime.date) or isinstance(value, datetime.time):
-        return True
+    elif value_type is not None:
+        return True  # dates, datetimes and times
 
     raise EvaluationError("Can't convert '%s' to a boolean" % str(value))
 
@@ -30,18 +54,22 @@ def to_integer(value, ctx):
     """
     Tries conversion of any value to an integer
     """
-    if isinstance(value, bool):
-        return 1 if value else 0
-    elif isinstance(value, int):
+    value_type = type(value)
+    if value_type not in _VALUE_TYPES_SET:
+        value_type = _value_type(value)
+
+    if value_type is int:
         return value
-    elif isinstance(value, Decimal):
+    elif value_type is bool:
+        return 1 if value else 0
+    elif value_type is Decimal:
         try:
             val = int(value.to_integral_exact(ROUND_HALF_UP))
             if isinstance(val, int):
                 return val
         except ArithmeticError:
             pass
-    elif isinstance(value, str):
+    elif value_type is str and '_' not in value:  # int() allows underscores between digits but we don't
         try:
             return int(value)
         except ValueError:
@@ -54,15 +82,21 @@ def to_decimal(value, ctx):
     """
     Tries conversion of any value to a decimal
     """
-    if isinstance(value, bool):
-        return Decimal(1) if value else Decimal(0)
-    elif isinstance(value, int):
-        return Decimal(value)
-    elif isinstance(value, Decimal):
+    value_type = type(value)
+    if value_type not in _VALUE_TYPES_SET:
+        value_type = _value_type(value)
+
+    if value_type is Decimal:
         return value
-    elif isinstance(value, str):
+    elif value_type is int:
+        return Decimal(value)
+    elif value_type is bool:
+        return DECIMAL_ONE if value else DECIMAL_ZERO
+    elif value_type is str and '_' not in value:  # Decimal() allows underscores between digits but we don't
         try:
-            return Decimal(value)
+            decimal = Decimal(value)
+            if decimal.is_finite():  # don't accept NaN or Infinity
+                return decimal
         except Exception:
             pass
 
@@ -73,20 +107,24 @@ def to_string(value, ctx):
     """
     Tries conversion of any value to a string
     """
-    if isinstance(value, bool):
-        return "TRUE" if value else "FALSE"
-    elif isinstance(value, int):
-        return str(value)
-    elif isinstance(value, Decimal):
-        return format_decimal(value)
-    elif isinstance(value, str):
+    value_type = type(value)
+    if value_type not in _VALUE_TYPES_SET:
+        value_type = _value_type(value)
+
+    if value_type is str:
         return value
-    elif type(value) == datetime.date:
+    elif value_type is Decimal:
+        return format_decimal(value)
+    elif value_type is int:
+        return str(value)
+    elif value_type is bool:
+        return "TRUE" if value else "FALSE"
+    elif value_type is datetime.datetime:
+        return value.astimezone(ctx.timezone).isoformat()
+    elif value_type is datetime.date:
         return value.strftime(ctx.get_date_format(False))
-    elif isinstance(value, datetime.time):
+    elif value_type is datetime.time:
         return value.strftime('%H:%M')
-    elif isinstance(value, datetime.datetime):
-        return value.astimezone(ctx.timezone).isoformat()
 
     raise EvaluationError("Can't convert '%s' to a string" % str(value))
 
@@ -95,13 +133,19 @@ def to_date(value, ctx):
     """
     Tries conversion of any value to a date
     """
-    if isinstance(value, str):
-        temporal = ctx.get_date_parser().auto(value)
-        if temporal is not None:
-            return to_date(temporal, ctx)
-    elif type(value) == datetime.date:
+    value_type = type(value)
+    if value_type not in _VALUE_TYPES_SET:
+        value_type = _value_type(value)
+
+    if value_type is str:
+        temporal = _parse_date_or_datetime(value, ctx)
+        if isinstance(temporal, datetime.datetime):
+            return temporal.date()  # discard time
+        elif temporal is not None:
+            return temporal
+    elif value_type is datetime.date:
         return value
-    elif isinstance(value, datetime.datetime):
+    elif value_type is datetime.datetime:
         return value.date()  # discard time
 
     raise EvaluationError("Can't convert '%s' to a date" % str(value))
@@ -111,13 +155,19 @@ def to_datetime(value, ctx):
     """
     Tries conversion of any value to a datetime
     """
-    if isinstance(value, str):
-        temporal = ctx.get_date_parser().auto(value)
-        if temporal is not None:
-            return to_datetime(temporal, ctx)
-    elif type(value) == datetime.date:
+    value_type = type(value)
+    if value_type not in _VALUE_TYPES_SET:
+        value_type = _value_type(value)
+
+    if value_type is str:
+        value = _parse_date_or_datetime(value, ctx)
+        if isinstance(value, datetime.datetime):
+            return value.astimezone(ctx.timezone)
+        elif value is not None:
+            return ctx.timezone.localize(datetime.datetime.combine(value, datetime.time(0, 0)))
+    elif value_type is datetime.date:
         return ctx.timezone.localize(datetime.datetime.combine(value, datetime.time(0, 0)))
-    elif isinstance(value, datetime.datetime):
+    elif value_type is datetime.datetime:
         return value.astimezone(ctx.timezone)
 
     raise EvaluationError("Can't convert '%s' to a datetime" % str(value))
@@ -127,13 +177,17 @@ def to_date_or_datetime(value, ctx):
     """
     Tries conversion of any value to a date or datetime
     """
-    if isinstance(value, str):
-        temporal = ctx.get_date_parser().auto(value)
+    value_type = type(value)
+    if value_type not in _VALUE_TYPES_SET:
+        value_type = _value_type(value)
+
+    if value_type is str:
+        temporal = _parse_date_or_datetime(value, ctx)
         if temporal is not None:
             return temporal
-    elif type(value) == datetime.date:
+    elif value_type is datetime.date:
         return value
-    elif isinstance(value, datetime.datetime):
+    elif value_type is datetime.datetime:
         return value.astimezone(ctx.timezone)
 
     raise EvaluationError("Can't convert '%s' to a date or datetime" % str(value))
@@ -143,26 +197,41 @@ def to_time(value, ctx):
     """
     Tries conversion of any value to a time
     """
-    if isinstance(value, str):
+    value_type = type(value)
+    if value_type not in _VALUE_TYPES_SET:
+        value_type = _value_type(value)
+
+    if value_type is str:
         time = ctx.get_date_parser().time(value)
         if time is not None:
             return time
-    elif isinstance(value, datetime.time):
+    elif value_type is datetime.time:
         return value
-    elif isinstance(value, datetime.datetime):
+    elif value_type is datetime.datetime:
         return value.astimezone(ctx.timezone).time()
 
     raise EvaluationError("Can't convert '%s' to a time" % str(value))
 
 
+def _parse_date_or_datetime(value, ctx):
+    # all string to date conversions share this parse, which is memoized so converting the same string to both a date
+    # and a datetime only parses it once
+    return ctx.get_date_parser().auto(value)
+
+
 def to_same(value1, value2, ctx):
     """
     Converts a pair of arguments to their most-likely types. This deviates from Excel which doesn't auto convert values
     but is necessary for us to intuitively handle contact fields which don't use the correct value type
     """
-    if type(value1) == type(value2):
+    type1, type2 = type(value1), type(value2)
+    if type1 is type2:
         return value1, value2
 
+    # pairs of numeric values can be converted to decimals directly
+    if type1 in _NUMERIC_TYPES and type2 in _NUMERIC_TYPES:
+        return (value1 if type1 is Decimal else Decimal(value1)), (value2 if type2 is Decimal else Decimal(value2))
+
     try:
         # try converting to two decimals
         return to_decimal(value1, ctx), to_decimal(value2, ctx)
@@ -174,7 +243,7 @@ def to_same(value1, value2, ctx):
         d1, d2 = to_date_or_datetime(value1, ctx), to_date_or_datetime(value2, ctx)
 
         # if either one is a datetime, then the other needs to become a datetime
-        if type(value1) != type(value2):
+        if type1 is not type2:
             d1, d2 = to_datetime(d1, ctx), to_datetime(d2, ctx)
         return d1, d2
     except EvaluationError:
@@ -190,7 +259,7 @@ def to_repr(value, ctx):
     """
     as_string = to_string(value, ctx)
 
-    if isinstance(value, str) or isinstance(value, datetime.date) or isinstance(value, datetime.time):
+    if isinstance(value, (str, datetime.date, datetime.time)):
         as_string = as_string.replace('"', '""')  # escape quotes by doubling
         as_string = '"%s"' % as_string
 
@@ -203,10 +272,9 @@ def format_decimal(decimal):
     :param decimal: the decimal value
     :return: the formatted string value
     """
-    # strip trailing fractional zeros
-    normalized = decimal.normalize()
-    sign, digits, exponent = normalized.as_tuple()
-    if exponent >= 1:
-        normalized = normalized.quantize(1)
+    # integral values can skip normalizing altogether
+    if decimal.is_finite() and decimal == decimal.to_integral_value():
+        return str(int(decimal))
 
-    return str(normalized)
+    # strip trailing fractional zeros, without switching to scientific notation for small values
+    return '{:f}'.format(decimal.normalize())
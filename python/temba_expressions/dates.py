@@ -4,8 +4,11 @@ import pytz
 import regex
 import iso8601
 
-from collections import OrderedDict
 from enum import Enum
+from functools import lru_cache
+
+# splits text into sequences of digits and sequences of letters
+DATE_TOKEN_REGEX = regex.compile(r'([0-9]+|[^\W\d]+)', flags=regex.MULTILINE | regex.UNICODE | regex.V0)
 
 
 class DateStyle(Enum):
@@ -26,6 +29,20 @@ class Component(Enum):
     OFFSET = 9
 
 
+# component values as plain ints for indexing lists of matched component values
+_YEAR = Component.YEAR.value
+_MONTH = Component.MONTH.value
+_DAY = Component.DAY.value
+_HOUR = Component.HOUR.value
+_MINUTE = Component.MINUTE.value
+_HOUR_AND_MINUTE = Component.HOUR_AND_MINUTE.value
+_SECOND = Component.SECOND.value
+_NANO = Component.NANO.value
+_AM_PM = Component.AM_PM.value
+_OFFSET = Component.OFFSET.value
+_NUM_COMPONENTS = len(Component)
+
+
 class Mode(Enum):
     DATE = 1
     DATETIME = 2
@@ -102,43 +119,53 @@ class DateParser(object):
         if text is None or not text.strip():
             return None
 
-        # first try to parse as an ISO8601 date, if it doesn't work we'll try other options
-        if len(text) >= 16:
+        # only the current year affects parsing, so keying on it lets results be reused across days
+        return self._parse_cached(text, mode, self._now.year, self._timezone, self._date_style)
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def _parse_cached(cls, text, mode, current_year, timezone, date_style):
+        """
+        Parses the given text, memoized on all the inputs which affect the result. Results are immutable date, datetime
+        or time values so are safe to share between parsers.
+        """
+        # first try to parse as an ISO8601 date, if it doesn't work we'll try other options. ISO8601 values always start
+        # with a 4 digit year so we can skip the attempt (and the exception it raises) for anything else
+        if len(text) >= 16 and text[:4].isdigit():
             try:
                 parsed = iso8601.parse_date(text, default_timezone=None)
                 if not parsed.tzinfo:
-                    parsed = self._timezone.localize(parsed)
+                    parsed = timezone.localize(parsed)
 
                 return parsed
             except iso8601.ParseError:
                 pass
 
         # split the text into numerical and text tokens
-        tokens = regex.findall(r'([0-9]+|[^\W\d]+)', text, flags=regex.MULTILINE | regex.UNICODE | regex.V0)
+        tokens = DATE_TOKEN_REGEX.findall(text)
 
         # get the possibilities for each token
         token_possibilities = []
         for token in tokens:
-            possibilities = self._get_token_possibilities(token, mode)
+            possibilities = cls._get_token_possibilities(token, mode)
             if len(possibilities) > 0:
                 token_possibilities.append(possibilities)
 
         # see what valid sequences we can make
-        sequences = self._get_possible_sequences(mode, len(token_possibilities), self._date_style)
+        sequences = cls._get_possible_sequences(mode, len(token_possibilities), date_style)
 
         for sequence in sequences:
-            match = OrderedDict()
-
-            for c in range(len(sequence)):
-                component = sequence[c]
-                value = token_possibilities[c].get(component, None)
-                match[component] = value
+            match = [None] * _NUM_COMPONENTS
 
+            for component, possibilities in zip(sequence, token_possibilities):
+                value = possibilities.get(component)
                 if value is None:
                     break
+
+                match[component.value] = value
             else:
                 # try to make a valid result from this and return if successful
-                obj = self._make_result(match, self._now, self._timezone)
+                obj = cls._make_result(match, current_year, timezone)
                 if obj is not None:
                     return obj
 
@@ -153,32 +180,50 @@ class DateParser(object):
         :param date_style: whether dates are usually entered day first or month first
         :return:
         """
-        sequences = []
-        date_sequences = cls.DATE_SEQUENCES_DAY_FIRST if date_style == DateStyle.DAY_FIRST else cls.DATE_SEQUENCES_MONTH_FIRST
+        return cls._SEQUENCE_TABLE.get((mode, length, date_style), ())
 
-        if mode == Mode.DATE or mode == Mode.AUTO:
-            for seq in date_sequences:
-                if len(seq) == length:
-                    sequences.append(seq)
+    @classmethod
+    def _build_sequence_table(cls):
+        """
+        Builds the table of possible component sequences keyed by mode, length and date style
+        """
+        table = {}
+        max_length = max(len(s) for s in cls.DATE_SEQUENCES_DAY_FIRST) + max(len(s) for s in cls.TIME_SEQUENCES)
+
+        for mode in Mode:
+            for date_style in DateStyle:
+                date_sequences = cls.DATE_SEQUENCES_DAY_FIRST if date_style == DateStyle.DAY_FIRST else cls.DATE_SEQUENCES_MONTH_FIRST
+
+                for length in range(1, max_length + 1):
+                    sequences = []
 
-        elif mode == Mode.TIME:
-            for seq in cls.TIME_SEQUENCES:
-                if len(seq) == length:
-                    sequences.append(seq)
+                    if mode == Mode.DATE or mode == Mode.AUTO:
+                        for seq in date_sequences:
+                            if len(seq) == length:
+                                sequences.append(seq)
 
-        if mode == Mode.DATETIME or mode == Mode.AUTO:
-            for date_seq in date_sequences:
-                for time_seq in cls.TIME_SEQUENCES:
-                    if len(date_seq) + len(time_seq) == length:
-                        sequences.append(date_seq + time_seq)
+                    elif mode == Mode.TIME:
+                        for seq in cls.TIME_SEQUENCES:
+                            if len(seq) == length:
+                                sequences.append(seq)
 
-        return sequences
+                    if mode == Mode.DATETIME or mode == Mode.AUTO:
+                        for date_seq in date_sequences:
+                            for time_seq in cls.TIME_SEQUENCES:
+                                if len(date_seq) + len(time_seq) == length:
+                                    sequences.append(date_seq + time_seq)
+
+                    if sequences:
+                        table[(mode, length, date_style)] = tuple(sequences)
+
+        cls._SEQUENCE_TABLE = table
 
     @classmethod
+    @lru_cache(maxsize=1024)
     def _get_token_possibilities(cls, token, mode):
         """
         Returns all possible component types of a token without regard to its context. For example "26" could be year,
-        date or minute, but can't be a month or an hour.
+        date or minute, but can't be a month or an hour. Results are memoized so shouldn't be modified.
         :param token: the token to classify
         :param mode: the parse mode
         :return: the dict of possible types and values if token was of that type
@@ -187,9 +232,10 @@ class DateParser(object):
         possibilities = {}
         try:
             as_int = int(token)
+            length = len(token)
 
             if mode != Mode.TIME:
-                if 1 <= as_int <= 9999 and (len(token) == 2 or len(token) == 4):
+                if 1 <= as_int <= 9999 and (length == 2 or length == 4):
                     possibilities[Component.YEAR] = as_int
                 if 1 <= as_int <= 12:
                     possibilities[Component.MONTH] = as_int
@@ -203,18 +249,17 @@ class DateParser(object):
                     possibilities[Component.MINUTE] = as_int
                 if 0 <= as_int <= 59:
                     possibilities[Component.SECOND] = as_int
-                if len(token) == 3 or len(token) == 6 or len(token) == 9:
+                if length == 3 or length == 6 or length == 9:
                     nano = 0
-                    if len(token) == 3:  # millisecond precision
+                    if length == 3:  # millisecond precision
                         nano = as_int * 1000000
-                    elif len(token) == 6:  # microsecond precision
+                    elif length == 6:  # microsecond precision
                         nano = as_int * 1000
-                    elif len(token) == 9:
+                    elif length == 9:
                         nano = as_int
                     possibilities[Component.NANO] = nano
-                if len(token) == 4:
-                    hour = as_int // 100
-                    minute = as_int - (hour * 100)
+                if length == 4:
+                    hour, minute = divmod(as_int, 100)
                     if 1 <= hour <= 24 and 1 <= minute <= 59:
                         possibilities[Component.HOUR_AND_MINUTE] = as_int
 
@@ -239,51 +284,55 @@ class DateParser(object):
         return possibilities
 
     @classmethod
-    def _make_result(cls, values, now, timezone):
+    def _make_result(cls, values, current_year, timezone):
         """
-        Makes a date or datetime or time object from a map of component values
-        :param values: the component values
-        :param now: the current now
+        Makes a date or datetime or time object from a list of component values
+        :param values: the component values, indexed by component value and None if not present
+        :param current_year: the current year
         :param timezone: the current timezone
         :return: the date, datetime, time or none if values are invalid
         """
         date = None
         time = None
 
-        if Component.MONTH in values:
-            year = cls._year_from_2digits(values.get(Component.YEAR, now.year), now.year)
-            month = values[Component.MONTH]
-            day = values.get(Component.DAY, 1)
+        month = values[_MONTH]
+        if month is not None:
+            year = values[_YEAR]
+            year = cls._year_from_2digits(year if year is not None else current_year, current_year)
+            day = values[_DAY]
             try:
-                date = datetime.date(year, month, day)
+                date = datetime.date(year, month, day if day is not None else 1)
             except ValueError:
                 return None  # not a valid date
 
-        if (Component.HOUR in values and Component.MINUTE in values) or Component.HOUR_AND_MINUTE in values:
-            if Component.HOUR_AND_MINUTE in values:
-                combined = values[Component.HOUR_AND_MINUTE]
-                hour = combined // 100
-                minute = combined - (hour * 100)
+        combined = values[_HOUR_AND_MINUTE]
+        hour = values[_HOUR]
+        minute = values[_MINUTE]
+        if combined is not None or (hour is not None and minute is not None):
+            if combined is not None:
+                hour, minute = divmod(combined, 100)
                 second = 0
                 nano = 0
             else:
-                hour = values[Component.HOUR]
-                minute = values[Component.MINUTE]
-                second = values.get(Component.SECOND, 0)
-                nano = values.get(Component.NANO, 0)
+                second = values[_SECOND]
+                nano = values[_NANO]
+                second = second if second is not None else 0
+                nano = nano if nano is not None else 0
 
-                if hour < 12 and values.get(Component.AM_PM) == cls.PM:
+                am_pm = values[_AM_PM]
+                if hour < 12 and am_pm == cls.PM:
                     hour += 12
-                elif hour == 12 and values.get(Component.AM_PM) == cls.AM:
+                elif hour == 12 and am_pm == cls.AM:
                     hour -= 12
 
             try:
-                time = datetime.time(hour, minute, second, microsecond=nano // 1000)
+                time = datetime.time(hour, minute, second, nano // 1000)
             except ValueError:
                 return None  # not a valid time
 
-        if Component.OFFSET in values:
-            timezone = pytz.FixedOffset(values[Component.OFFSET] // 60)
+        offset = values[_OFFSET]
+        if offset is not None:
+            timezone = pytz.FixedOffset(offset // 60)
 
         if date is not None and time is not None:
             return timezone.localize(datetime.datetime.combine(date, time))
@@ -316,11 +365,13 @@ def load_month_aliases(filename):
     alias_file = pkg_resources.resource_string(__name__, filename).decode('UTF-8', 'replace')
     aliases = {}
     month = 1
-    for line in alias_file.split('\n'):
+    for line in alias_file.splitlines():
         for alias in line.split(','):
-            aliases[alias] = month
+            aliases[alias.strip().lower()] = month  # tokens are lowercased before lookup
         month += 1
     return aliases
 
 
 MONTHS_BY_ALIAS = load_month_aliases('month.aliases')
+
+DateParser._build_sequence_table()
@@ -1,6 +1,7 @@
 import datetime
 import json
 import logging
+import operator
 import pytz
 
 from antlr4 import InputStream, CommonTokenStream, ParseTreeVisitor, Token
@@ -8,10 +9,13 @@ from antlr4.error.Errors import ParseCancellationException, NoViableAltException
 from antlr4.error.ErrorStrategy import BailErrorStrategy
 from decimal import Decimal
 from enum import Enum
+from functools import lru_cache
 from . import conversions, EvaluationError
 from .dates import DateStyle, DateParser
 from .functions import FunctionManager, custom, excel
-from .utils import decimal_pow, urlquote, parse_json_date
+from .gen.ExcellentLexer import ExcellentLexer
+from .gen.ExcellentParser import ExcellentParser
+from .utils import decimal_pow, urlquote, parse_json_date, DECIMAL_ZERO
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +24,32 @@ DEFAULT_FUNCTION_MANAGER = FunctionManager()
 DEFAULT_FUNCTION_MANAGER.add_library(excel)
 DEFAULT_FUNCTION_MANAGER.add_library(custom)
 
+# comparison operator functions keyed by their token type
+COMPARISON_OPERATORS = {
+    ExcellentParser.LTE: operator.le,
+    ExcellentParser.LT: operator.lt,
+    ExcellentParser.GTE: operator.ge,
+    ExcellentParser.GT: operator.gt,
+}
+
+# json.dumps builds a new encoder for every call with non-default options, so keep one to re-use
+COMPACT_JSON_ENCODER = json.JSONEncoder(separators=(',', ':'))
+
+DATE_FORMATS = {
+    (DateStyle.DAY_FIRST, False): "%d-%m-%Y",
+    (DateStyle.DAY_FIRST, True): "%d-%m-%Y %H:%M",
+    (DateStyle.MONTH_FIRST, False): "%m-%d-%Y",
+    (DateStyle.MONTH_FIRST, True): "%m-%d-%Y %H:%M",
+}
+
+
+@lru_cache(maxsize=64)
+def get_shared_date_parser(today, timezone, date_style):
+    """
+    Gets a date parser for the given day, timezone and date style, shared by all callers with the same values
+    """
+    return DateParser(today, timezone, date_style)
+
 
 class EvaluationContext(object):
     """
@@ -47,18 +77,11 @@ class EvaluationContext(object):
         self.variables[key] = value
 
     def get_date_format(self, inc_time):
-        if self.date_style == DateStyle.DAY_FIRST:
-            pattern = "%d-%m-%Y"
-        else:
-            pattern = "%m-%d-%Y"
-
-        if inc_time:
-            pattern += " %H:%M"
-
-        return pattern
+        return DATE_FORMATS[(self.date_style, inc_time)]
 
     def get_date_parser(self):
-        return DateParser(datetime.date.today(), self.timezone, self.date_style)
+        # parsers are shared between all contexts with the same timezone and date style, until the day changes
+        return get_shared_date_parser(datetime.date.today(), self.timezone, self.date_style)
 
     def _resolve_variable_in_container(self, container, path, original_path):
         if '.' in path:
@@ -67,13 +90,15 @@ class EvaluationContext(object):
             item = path
             remaining_path = None
 
-        # copy of container with all lowercase keys
-        container = {k.lower(): v for k, v in container.items()}
-
-        if item not in container:
-            raise EvaluationError("Undefined variable: %s" % original_path)
-
-        value = container[item]
+        # keys are matched case-insensitively, but most are already lowercase so try an exact lookup first
+        if item in container:
+            value = container[item]
+        else:
+            for key, value in container.items():
+                if key.lower() == item:
+                    break
+            else:
+                raise EvaluationError("Undefined variable: %s" % original_path)
 
         if remaining_path is not None and value is not None:
             if not isinstance(value, dict):
@@ -99,7 +124,7 @@ class EvaluationContext(object):
             elif '__default__' in value:
                 return value['__default__']
             else:
-                return json.dumps(value, separators=(',', ':'))  # return serialized JSON if no default
+                return COMPACT_JSON_ENCODER.encode(value)  # return serialized JSON if no default
         elif isinstance(value, bool):
             return value
         elif isinstance(value, float) or isinstance(value, int):
@@ -148,9 +173,52 @@ class Evaluator(object):
         :param url_encode: whether or not values should be URL encoded
         :return: a tuple of the evaluated template and a list of evaluation errors
         """
+        # templates without any expression prefix are returned as is
+        if self._expression_prefix not in template:
+            return template, []
+
+        segments = self._split_template(template, self._expression_prefix)
+        return self._evaluate_segments(segments, context, url_encode, strategy)
+
+    def evaluate_template_batch(self, template, contexts, url_encode=False, strategy=EvaluationStrategy.COMPLETE):
+        """
+        Evaluates a template string against each of the given contexts, e.g. to send a message to many contacts
+        :param template: the template string
+        :param contexts: the evaluation contexts
+        :param url_encode: whether or not values should be URL encoded
+        :return: a list of tuples of the evaluated template and a list of evaluation errors, one for each context
+        """
+        segments = self._split_template(template, self._expression_prefix)
+        return [self._evaluate_segments(segments, context, url_encode, strategy) for context in contexts]
+
+    def _evaluate_segments(self, segments, context, url_encode, strategy):
+        """
+        Evaluates a split template, resolving each expression block against the given context
+        """
+        output = []
+        errors = []
+
+        for text, is_expression in segments:
+            if is_expression:
+                output.append(self._resolve_expression_block(text, context, url_encode, strategy, errors))
+            else:
+                output.append(text)
+
+        return ''.join(output), errors
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _split_template(template, expression_prefix):
+        """
+        Splits a template string into a tuple of segments which are either literal text or expression blocks. This
+        doesn't depend on the context so is memoized on the template string.
+        :param template: the template string
+        :param expression_prefix: the prefix for expressions, e.g. @
+        :return: a tuple of (text, is_expression) pairs
+        """
         input_chars = list(template)
+        segments = []
         output_chars = []
-        errors = []
         state = State.BODY
         current_expression_chars = []
         current_expression_terminated = False
@@ -166,10 +234,10 @@ class Evaluator(object):
             next_next_ch = input_chars[pos + 2] if (pos < (len(input_chars) - 2)) else None
 
             if state == State.BODY:
-                if ch == self._expression_prefix and (is_word_char(next_ch) or next_ch == '('):
+                if ch == expression_prefix and (is_word_char(next_ch) or next_ch == '('):
                     state = State.PREFIX
                     current_expression_chars = [ch]
-                elif ch == self._expression_prefix and next_ch == self._expression_prefix:
+                elif ch == expression_prefix and next_ch == expression_prefix:
                     state = State.ESCAPED_PREFIX
                 else:
                     output_chars.append(ch)
@@ -220,8 +288,11 @@ class Evaluator(object):
                     current_expression_terminated = True
 
             if current_expression_terminated:
-                expression = ''.join(current_expression_chars)
-                output_chars.append(self._resolve_expression_block(expression, context, url_encode, strategy, errors))
+                if output_chars:
+                    segments.append((''.join(output_chars), False))
+                    output_chars = []
+
+                segments.append((''.join(current_expression_chars), True))
                 current_expression_chars = []
                 current_expression_terminated = False
                 state = State.BODY
@@ -230,8 +301,10 @@ class Evaluator(object):
         if not current_expression_terminated and current_expression_chars:
             output_chars.append(''.join(current_expression_chars))
 
-        output = ''.join(output_chars)  # joining is fastest way to build strings in Python
-        return output, errors
+        if output_chars:
+            segments.append((''.join(output_chars), False))  # joining is fastest way to build strings in Python
+
+        return tuple(segments)
 
     def _resolve_expression_block(self, expression, context, url_encode, strategy, errors):
         """
@@ -268,9 +341,25 @@ class Evaluator(object):
         :param strategy: the evaluation strategy
         :return: the evaluated expression value
         """
-        from .gen.ExcellentLexer import ExcellentLexer
-        from .gen.ExcellentParser import ExcellentParser
+        tokens, tree = self._parse_expression(expression)
+
+        if strategy == EvaluationStrategy.RESOLVE_AVAILABLE:
+            resolved = self._resolve_available(tokens, context)
+            if resolved is not None:
+                return resolved
+
+        visitor = ExcellentVisitor(self._function_manager, context)
+        return visitor.visit(tree)
 
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _parse_expression(expression):
+        """
+        Parses a single expression into its token stream and parse tree. These are only read during evaluation so are
+        memoized on the expression string and shared between evaluations.
+        :param expression: the expression string
+        :return: a tuple of the token stream (all tokens fetched) and the parse tree
+        """
         stream = InputStream(expression)
         lexer = ExcellentLexer(stream)
         tokens = CommonTokenStream(lexer)
@@ -295,13 +384,7 @@ class Evaluator(object):
 
             raise EvaluationError(message, ex)
 
-        if strategy == EvaluationStrategy.RESOLVE_AVAILABLE:
-            resolved = self._resolve_available(tokens, context)
-            if resolved is not None:
-                return resolved
-
-        visitor = ExcellentVisitor(self._function_manager, context)
-        return visitor.visit(tree)
+        return tokens, tree
 
     def _resolve_available(self, tokens, context):
         """
@@ -311,8 +394,6 @@ class Evaluator(object):
         :param context: the evaluation context
         :return: the partially evaluated expression or none if expression can be fully evaluated
         """
-        from .gen.ExcellentParser import ExcellentParser
-
         has_missing = False
         output_components = []
 
@@ -387,7 +468,7 @@ class ExcellentVisitor(ParseTreeVisitor):
         """
         arg1 = conversions.to_decimal(self.visit(ctx.expression(0)), self._eval_context)
         arg2 = conversions.to_decimal(self.visit(ctx.expression(1)), self._eval_context)
-        return conversions.to_decimal(decimal_pow(arg1, arg2), ctx)
+        return decimal_pow(arg1, arg2)
 
     def visitMultiplicationOrDivisionExpression(self, ctx):
         """
@@ -398,7 +479,7 @@ class ExcellentVisitor(ParseTreeVisitor):
         arg1 = conversions.to_decimal(self.visit(ctx.expression(0)), self._eval_context)
         arg2 = conversions.to_decimal(self.visit(ctx.expression(1)), self._eval_context)
 
-        if not is_mul and arg2 == Decimal(0):
+        if not is_mul and arg2 == DECIMAL_ZERO:
             raise EvaluationError("Division by zero")
 
         return arg1 * arg2 if is_mul else arg1 / arg2
@@ -445,18 +526,10 @@ class ExcellentVisitor(ParseTreeVisitor):
 
         if isinstance(arg1, str):
             # string comparison is case-insensitive
-            compared = (arg1.lower() > arg2.lower()) - (arg1.lower() < arg2.lower())
-        else:
-            compared = (arg1 > arg2) - (arg1 < arg2)
-
-        if ctx.LTE() is not None:
-            return compared <= 0
-        elif ctx.LT() is not None:
-            return compared < 0
-        elif ctx.GTE() is not None:
-            return compared >= 0
-        else:  # GT
-            return compared > 0
+            arg1, arg2 = arg1.lower(), arg2.lower()
+
+        # operator is always the middle child, i.e. expression op expression
+        return COMPARISON_OPERATORS[ctx.getChild(1).symbol.type](arg1, arg2)
 
     def visitEqualityExpression(self, ctx):
         """
@@ -5,6 +5,8 @@ class FunctionManager(object):
 
     def __init__(self):
         self._functions = {}
+        self._arg_specs = {}
+        self._invokables = {}  # function and its adapter by lowercase and uppercase name
 
     def add_library(self, library):
         """
@@ -12,9 +14,9 @@ class FunctionManager(object):
         :param library: the library module
         :return:
         """
-        for fn in library.__dict__.copy().values():
+        for fn in library.__dict__.values():
             # ignore imported methods and anything beginning __
-            if inspect.isfunction(fn) and inspect.getmodule(fn) == library and not fn.__name__.startswith('__'):
+            if inspect.isfunction(fn) and fn.__module__ == library.__name__ and not fn.__name__.startswith('__'):
                 name = fn.__name__.lower()
 
                 # strip preceding _ chars used to avoid conflicts with Java keywords
@@ -22,9 +24,22 @@ class FunctionManager(object):
                     name = name[1:]
 
                 self._functions[name] = fn
+                self._arg_specs[fn] = self._build_arg_spec(fn)
+
+                invokable = (fn, self._build_adapter(fn, *self._arg_specs[fn]))
+                self._invokables[name] = invokable
+                self._invokables[name.upper()] = invokable
 
     def get_function(self, name):
-        return self._functions.get(name.lower(), None)
+        invokable = self._get_invokable(name)
+        return invokable[0] if invokable else None
+
+    def _get_invokable(self, name):
+        # function names are usually written all uppercase or all lowercase so try an exact match first
+        invokable = self._invokables.get(name)
+        if invokable is None:
+            invokable = self._invokables.get(name.lower())
+        return invokable
 
     def invoke_function(self, ctx, name, arguments):
         """
@@ -34,67 +49,30 @@ class FunctionManager(object):
         :param arguments: the arguments to be passed to the function
         :return: the function return value
         """
-        from temba_expressions import EvaluationError, conversions
+        from temba_expressions import EvaluationError
 
         # find function with given name
-        func = self.get_function(name)
-        if func is None:
+        invokable = self._get_invokable(name)
+        if invokable is None:
             raise EvaluationError("Undefined function: %s" % name)
 
-        args, varargs, defaults = self._get_arg_spec(func)
-
-        call_args = []
-        passed_args = list(arguments)
-
-        for arg in args:
-            if arg == 'ctx':
-                call_args.append(ctx)
-            elif passed_args:
-                call_args.append(passed_args.pop(0))
-            elif arg in defaults:
-                call_args.append(defaults[arg])
-            else:
-                raise EvaluationError("Too few arguments provided for function %s" % name)
-
-        if varargs is not None:
-            call_args.extend(passed_args)
-            passed_args = []
-
-        # any unused arguments?
-        if passed_args:
-            raise EvaluationError("Too many arguments provided for function %s" % name)
-
-        try:
-            return func(*call_args)
-        except Exception as e:
-            pretty_args = []
-            for arg in arguments:
-                if isinstance(arg, str):
-                    pretty = '"%s"' % arg
-                else:
-                    try:
-                        pretty = conversions.to_string(arg, ctx)
-                    except EvaluationError:
-                        pretty = str(arg)
-                pretty_args.append(pretty)
-
-            raise EvaluationError("Error calling function %s with arguments %s" % (name, ', '.join(pretty_args)), e)
+        return invokable[1](ctx, name, arguments)
 
     def build_listing(self):
         """
         Builds a listing of all functions sorted A-Z, with their names and descriptions
         """
         def func_entry(name, func):
-            args, varargs, defaults = self._get_arg_spec(func)
+            args, varargs, defaults = self._arg_specs[func]  # computed when function was added
 
             # add regular arguments
-            params = [{'name': str(a), 'optional': a in defaults, 'vararg': False} for a in args if a != 'ctx']
+            params = [{'name': a, 'optional': a in defaults, 'vararg': False} for a in args if a != 'ctx']
 
             # add possible variable argument
             if varargs:
-                params += [{'name': str(varargs), 'optional': False, 'vararg': True}]
+                params += [{'name': varargs, 'optional': False, 'vararg': True}]
 
-            return {'name': str(name.upper()),
+            return {'name': name.upper(),
                     'description': str(func.__doc__).strip(),
                     'params': params}
 
@@ -102,11 +80,88 @@ class FunctionManager(object):
         return sorted(listing, key=lambda l: l['name'])
 
     @staticmethod
-    def _get_arg_spec(func):
+    def _build_adapter(func, args, varargs, defaults):
+        """
+        Builds a function which maps the arguments passed to a function in an expression to its actual parameters and
+        calls it
+        """
+        from temba_expressions import EvaluationError
+
+        call_error = FunctionManager._call_error
+        ctx_index = args.index('ctx') if 'ctx' in args else None
+        params = [a for a in args if a != 'ctx']
+        num_params = len(params)
+        num_required = len([p for p in params if p not in defaults])
+        optional_defaults = [defaults[p] for p in params[num_required:]]
+        has_varargs = varargs is not None
+
+        if ctx_index is not None and ctx_index > 0:
+            # wrap functions which don't take the context first so that it can always be passed first
+            target = func
+            func = lambda ctx, *a: target(*a[:ctx_index], ctx, *a[ctx_index:])
+
+        takes_ctx = ctx_index is not None
+
+        if not optional_defaults and not has_varargs:
+            # fixed arity functions can be called with exactly the passed arguments
+            def fixed_adapter(ctx, name, arguments):
+                num_passed = len(arguments)
+                if num_passed < num_params:
+                    raise EvaluationError("Too few arguments provided for function %s" % name)
+                if num_passed > num_params:
+                    raise EvaluationError("Too many arguments provided for function %s" % name)
+
+                try:
+                    return func(ctx, *arguments) if takes_ctx else func(*arguments)
+                except Exception as e:
+                    raise call_error(ctx, name, arguments, e)
+
+            return fixed_adapter
+
+        def adapter(ctx, name, arguments):
+            num_passed = len(arguments)
+
+            if num_passed < num_required:
+                raise EvaluationError("Too few arguments provided for function %s" % name)
+            if num_passed > num_params and not has_varargs:
+                raise EvaluationError("Too many arguments provided for function %s" % name)
+
+            # fill in defaults for any optional parameters which weren't passed
+            missing = optional_defaults[num_passed - num_required:] if num_passed < num_params else ()
+
+            try:
+                return func(ctx, *arguments, *missing) if takes_ctx else func(*arguments, *missing)
+            except Exception as e:
+                raise call_error(ctx, name, arguments, e)
+
+        return adapter
+
+    @staticmethod
+    def _call_error(ctx, name, arguments, e):
+        """
+        Creates the error raised when calling a function fails, which includes the arguments it was passed
+        """
+        from temba_expressions import EvaluationError, conversions
+
+        pretty_args = []
+        for arg in arguments:
+            if isinstance(arg, str):
+                pretty = '"%s"' % arg
+            else:
+                try:
+                    pretty = conversions.to_string(arg, ctx)
+                except EvaluationError:
+                    pretty = str(arg)
+            pretty_args.append(pretty)
+
+        return EvaluationError("Error calling function %s with arguments %s" % (name, ', '.join(pretty_args)), e)
+
+    @staticmethod
+    def _build_arg_spec(func):
         """
-        Gets the argument spec of the given function, returning defaults as a dict of param names to values
+        Builds the argument spec of the given function, returning defaults as a dict of param names to values
         """
-        args, varargs, keywords, defaults = inspect.getargspec(func)
+        args, varargs, keywords, defaults = inspect.getfullargspec(func)[:4]
 
         # build a mapping from argument names to their default values, if any:
         if defaults is None:
@@ -1,10 +1,10 @@
-import operator
 import regex
 
 from decimal import Decimal
+from functools import lru_cache
 
 from temba_expressions import conversions
-from temba_expressions.utils import tokenize
+from temba_expressions.utils import tokenize, DECIMAL_HUNDRED
 
 
 def field(ctx, text, index, delimiter=' '):
@@ -38,7 +38,7 @@ def percent(ctx, number):
     """
     Formats a number as a percentage
     """
-    return '%d%%' % int(round(conversions.to_decimal(number, ctx) * 100))
+    return '%d%%' % int(round(conversions.to_decimal(number, ctx) * DECIMAL_HUNDRED))
 
 
 def epoch(ctx, datetime):
@@ -52,8 +52,9 @@ def read_digits(ctx, text):
     """
     Formats digits in text for reading in TTS
     """
-    def chunk(value, chunk_size):
-        return [value[i: i + chunk_size] for i in range(0, len(value), chunk_size)]
+    def read_chunks(value, chunk_size):
+        # each chunk is read digit by digit, with a pause between chunks
+        return ' , '.join([' '.join(value[i: i + chunk_size]) for i in range(0, len(value), chunk_size)])
 
     text = conversions.to_string(text, ctx).strip()
     if not text:
@@ -74,13 +75,11 @@ def read_digits(ctx, text):
 
     # triplets, most international phone numbers
     if length % 3 == 0 and length > 3:
-        chunks = chunk(text, 3)
-        return ' '.join(','.join(chunks))
+        return read_chunks(text, 3)
 
     # quads, credit cards
     if length % 4 == 0:
-        chunks = chunk(text, 4)
-        return ' '.join(','.join(chunks))
+        return read_chunks(text, 4)
 
     # otherwise, just put a comma between each number
     return ','.join(text)
@@ -130,9 +129,12 @@ def word_slice(ctx, text, start, stop=0, by_spaces=False):
     elif stop > 0:
         stop -= 1  # convert to a zero-based offset
 
-    words = __get_words(text, by_spaces)
+    # if both offsets count from the start, we only need the words up to the stop offset
+    limit = stop if start >= 0 and stop is not None and stop >= 0 else None
 
-    selection = operator.getitem(words, slice(start, stop))
+    words = __get_words(text, by_spaces, limit)
+
+    selection = words[start:stop]
 
     # re-combine selected words with a single space
     return ' '.join(selection)
@@ -142,8 +144,8 @@ def format_date(ctx, text):
     """
     Takes a single parameter (date as string) and returns it in the format defined by the org
     """
-    dt = conversions.to_datetime(text, ctx)
-    return dt.astimezone(ctx.timezone).strftime(ctx.get_date_format(True))
+    # to_datetime always gives us a datetime in the context timezone
+    return conversions.to_datetime(text, ctx).strftime(ctx.get_date_format(True))
 
 
 def format_location(ctx, text):
@@ -162,8 +164,7 @@ def regex_group(ctx, text, pattern, group_num):
     pattern = conversions.to_string(pattern, ctx)
     group_num = conversions.to_integer(group_num, ctx)
 
-    expression = regex.compile(pattern, regex.UNICODE | regex.IGNORECASE | regex.MULTILINE | regex.V0)
-    match = expression.search(text)
+    match = __compile_pattern(pattern).search(text)
 
     if not match:
         return ""
@@ -176,16 +177,27 @@ def regex_group(ctx, text, pattern, group_num):
 
 #################################### Helper (not available in expressions) ####################################
 
-def __get_words(text, by_spaces):
+def __get_words(text, by_spaces, limit=None):
     """
     Helper function which splits the given text string into words. If by_spaces is false, then text like
     '01-02-2014' will be split into 3 separate words. For backwards compatibility, this is the default for all
     expression functions.
     :param text: the text to split
     :param by_spaces: whether words should be split only by spaces or by punctuation like '-', '.' etc
+    :param limit: the number of words needed from the start of the text, or None if all words are needed
     """
     if by_spaces:
-        splits = regex.split(r'\s+', text, flags=regex.MULTILINE | regex.UNICODE | regex.V0)
-        return [split for split in splits if split]   # return only non-empty
+        if limit is None:
+            return text.split()  # splits on runs of whitespace, dropping empty words
+        return text.split(None, limit)[:limit]  # last split is the unsplit remainder
     else:
-        return tokenize(text)
+        return tokenize(text)[:limit]
+
+
+@lru_cache(maxsize=256)
+def __compile_pattern(pattern):
+    """
+    Helper function which compiles a user provided regex pattern, memoized as flows tend to re-use the same patterns
+    :param pattern: the regex pattern
+    """
+    return regex.compile(pattern, regex.UNICODE | regex.IGNORECASE | regex.MULTILINE | regex.V0)
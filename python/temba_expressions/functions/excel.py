@@ -4,11 +4,15 @@ from datetime import date as _date, time as _time
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP, ROUND_DOWN, ROUND_UP
 from temba_expressions import conversions
-from temba_expressions.utils import decimal_pow, decimal_round
+from temba_expressions.utils import decimal_pow, decimal_round, DECIMAL_ZERO
 
 
 E = Decimal('2.718281828459045235360287471')
 
+# the non-printable ASCII control characters, as a translation table for strings and as a deletion set for bytes
+NON_PRINTABLE_CHARS = dict.fromkeys(range(32))
+NON_PRINTABLE_BYTES = bytes(range(32))
+
 
 # =============================== Text ===============================
 
@@ -24,7 +28,12 @@ def clean(ctx, text):
     Removes all non-printable characters from a text string
     """
     text = conversions.to_string(text, ctx)
-    return ''.join([c for c in text if ord(c) >= 32])
+
+    # deleting from bytes is quicker than translating a string, so use that when the text is ASCII
+    if text.isascii():
+        return text.encode('ascii').translate(None, NON_PRINTABLE_BYTES).decode('ascii')
+
+    return text.translate(NON_PRINTABLE_CHARS)
 
 
 def code(ctx, text):
@@ -38,10 +47,7 @@ def concatenate(ctx, *text):
     """
     Joins text strings into one text string
     """
-    result = ''
-    for arg in text:
-        result += conversions.to_string(arg, ctx)
-    return result
+    return ''.join([arg if type(arg) is str else conversions.to_string(arg, ctx) for arg in text])
 
 
 def fixed(ctx, number, decimals=2, no_commas=False):
@@ -49,8 +55,7 @@ def fixed(ctx, number, decimals=2, no_commas=False):
     Formats the given number in decimal format using a period and commas
     """
     value = _round(ctx, number, decimals)
-    format_str = '{:f}' if no_commas else '{:,f}'
-    return format_str.format(value)
+    return format(value, 'f' if no_commas else ',f')
 
 
 def left(ctx, text, num_chars):
@@ -60,28 +65,32 @@ def left(ctx, text, num_chars):
     num_chars = conversions.to_integer(num_chars, ctx)
     if num_chars < 0:
         raise ValueError("Number of chars can't be negative")
-    return conversions.to_string(text, ctx)[0:num_chars]
+    text = text if type(text) is str else conversions.to_string(text, ctx)
+    return text[0:num_chars]
 
 
 def _len(ctx, text):
     """
     Returns the number of characters in a text string
     """
-    return len(conversions.to_string(text, ctx))
+    text = text if type(text) is str else conversions.to_string(text, ctx)
+    return len(text)
 
 
 def lower(ctx, text):
     """
     Converts a text string to lowercase
     """
-    return conversions.to_string(text, ctx).lower()
+    text = text if type(text) is str else conversions.to_string(text, ctx)
+    return text.lower()
 
 
 def proper(ctx, text):
     """
     Capitalizes the first letter of every word in a text string
     """
-    return conversions.to_string(text, ctx).title()
+    text = text if type(text) is str else conversions.to_string(text, ctx)
+    return text.title()
 
 
 def rept(ctx, text, number_times):
@@ -103,7 +112,8 @@ def right(ctx, text, num_chars):
     elif num_chars == 0:
         return ''
     else:
-        return conversions.to_string(text, ctx)[-num_chars:]
+        text = text if type(text) is str else conversions.to_string(text, ctx)
+        return text[-num_chars:]
 
 
 def substitute(ctx, text, old_text, new_text, instance_num=-1):
@@ -113,18 +123,16 @@ def substitute(ctx, text, old_text, new_text, instance_num=-1):
     text = conversions.to_string(text, ctx)
     old_text = conversions.to_string(old_text, ctx)
     new_text = conversions.to_string(new_text, ctx)
+    instance_num = conversions.to_integer(instance_num, ctx)
 
     if instance_num < 0:
         return text.replace(old_text, new_text)
     else:
         splits = text.split(old_text)
-        output = splits[0]
-        instance = 1
-        for split in splits[1:]:
-            sep = new_text if instance == instance_num else old_text
-            output += sep + split
-            instance += 1
-        return output
+        if instance_num == 0 or instance_num >= len(splits):
+            return text  # no such instance to replace
+
+        return old_text.join(splits[:instance_num]) + new_text + old_text.join(splits[instance_num:])
 
 
 def unichar(ctx, number):
@@ -148,7 +156,8 @@ def upper(ctx, text):
     """
     Converts a text string to uppercase
     """
-    return conversions.to_string(text, ctx).upper()
+    text = text if type(text) is str else conversions.to_string(text, ctx)
+    return text.upper()
 
 
 # =============================== Date and time ===============================
@@ -325,12 +334,7 @@ def _max(ctx, *number):
     if len(number) == 0:
         raise ValueError("Wrong number of arguments")
 
-    result = conversions.to_decimal(number[0], ctx)
-    for arg in number[1:]:
-        arg = conversions.to_decimal(arg, ctx)
-        if arg > result:
-            result = arg
-    return result
+    return max([conversions.to_decimal(arg, ctx) for arg in number])
 
 
 def _min(ctx, *number):
@@ -340,12 +344,7 @@ def _min(ctx, *number):
     if len(number) == 0:
         raise ValueError("Wrong number of arguments")
 
-    result = conversions.to_decimal(number[0], ctx)
-    for arg in number[1:]:
-        arg = conversions.to_decimal(arg, ctx)
-        if arg < result:
-            result = arg
-    return result
+    return min([conversions.to_decimal(arg, ctx) for arg in number])
 
 
 def mod(ctx, number, divisor):
@@ -417,10 +416,7 @@ def _sum(ctx, *number):
     if len(number) == 0:
         raise ValueError("Wrong number of arguments")
 
-    result = Decimal(0)
-    for arg in number:
-        result += conversions.to_decimal(arg, ctx)
-    return result
+    return sum([conversions.to_decimal(arg, ctx) for arg in number], DECIMAL_ZERO)
 
 
 def trunc(ctx, number):
@@ -7,10 +7,9 @@ import unittest
 
 from datetime import datetime, date, time
 from decimal import Decimal
-from six.moves import filter
-from time import clock
+from time import perf_counter_ns
 from . import conversions, EvaluationError
-from .dates import DateParser, DateStyle
+from .dates import DateParser, DateStyle, Component, Mode
 from .evaluator import Evaluator, EvaluationContext, EvaluationStrategy, DEFAULT_FUNCTION_MANAGER
 from .functions import FunctionManager, excel, custom
 from .utils import urlquote, decimal_pow, tokenize, format_json_date, parse_json_date
@@ -89,6 +88,18 @@ class DateParserTest(unittest.TestCase):
         for test in tests:
             self.assertEqual(parser.time(test[0]), test[1], "Parser error for %s" % test[0])
 
+    def test_get_possible_sequences(self):
+        self.assertEqual(DateParser._get_possible_sequences(Mode.DATE, 2, DateStyle.DAY_FIRST), (
+            [Component.DAY, Component.MONTH],
+            [Component.MONTH, Component.DAY],
+            [Component.MONTH, Component.YEAR],
+        ))
+        self.assertEqual(DateParser._get_possible_sequences(Mode.TIME, 1, DateStyle.DAY_FIRST), (
+            [Component.HOUR_AND_MINUTE],
+        ))
+        self.assertEqual(len(DateParser._get_possible_sequences(Mode.AUTO, 5, DateStyle.MONTH_FIRST)), 9)
+        self.assertEqual(DateParser._get_possible_sequences(Mode.DATE, 9, DateStyle.DAY_FIRST), ())
+
     def test_year_from_2digits(self):
         self.assertEqual(DateParser._year_from_2digits(1, 2015), 2001)
         self.assertEqual(DateParser._year_from_2digits(64, 2015), 2064)
@@ -141,7 +152,12 @@ class ConversionsTest(unittest.TestCase):
 
         self.assertEqual(conversions.to_integer("1234", self.context), 1234)
 
+        self.assertEqual(conversions.to_integer(" -12 ", self.context), -12)
+        self.assertEqual(conversions.to_integer("12\xa0", self.context), 12)  # any Unicode whitespace is stripped
+
         self.assertRaises(EvaluationError, conversions.to_integer, 'x', self.context)
+        self.assertRaises(EvaluationError, conversions.to_integer, '1.5', self.context)
+        self.assertRaises(EvaluationError, conversions.to_integer, '1_000', self.context)
 
     def test_to_decimal(self):
         self.assertEqual(conversions.to_decimal(True, self.context), Decimal(1))
@@ -154,7 +170,15 @@ class ConversionsTest(unittest.TestCase):
 
         self.assertEqual(conversions.to_decimal("1234.5678", self.context), Decimal("1234.5678"))
 
+        self.assertEqual(conversions.to_decimal(" -1.5e2 ", self.context), Decimal("-150"))
+        self.assertEqual(conversions.to_decimal(".5", self.context), Decimal("0.5"))
+        self.assertEqual(conversions.to_decimal("\u20035\u2003", self.context), Decimal("5"))
+
         self.assertRaises(EvaluationError, conversions.to_decimal, 'x', self.context)
+        self.assertRaises(EvaluationError, conversions.to_decimal, '1.2.3', self.context)
+        self.assertRaises(EvaluationError, conversions.to_decimal, 'NaN', self.context)
+        self.assertRaises(EvaluationError, conversions.to_decimal, '-Infinity', self.context)
+        self.assertRaises(EvaluationError, conversions.to_decimal, '1_000.5', self.context)
 
     def test_to_string(self):
         self.assertEqual(conversions.to_string(True, self.context), "TRUE")
@@ -169,9 +193,19 @@ class ConversionsTest(unittest.TestCase):
         self.assertEqual(conversions.to_string(Decimal("1234567890.50"), self.context), "1234567890.5")
         self.assertEqual(conversions.to_string(Decimal("33.333333333333"), self.context), "33.333333333333")
         self.assertEqual(conversions.to_string(Decimal("66.666666666666"), self.context), "66.666666666666")
+        self.assertEqual(conversions.to_string(Decimal("0.00000010"), self.context), "0.0000001")
+        self.assertEqual(conversions.to_string(Decimal("-0.0"), self.context), "0")
+        self.assertEqual(conversions.to_string(Decimal("1E+30"), self.context), "1000000000000000000000000000000")
 
         self.assertEqual(conversions.to_string("hello", self.context), "hello")
 
+        # subclasses of supported types are converted like their base type
+        class SubStr(str):
+            pass
+
+        self.assertEqual(conversions.to_string(SubStr("hello"), self.context), "hello")
+        self.assertRaises(EvaluationError, conversions.to_string, object(), self.context)
+
         self.assertEqual(conversions.to_string(date(2012, 3, 4), self.context), "04-03-2012")
         self.assertEqual(conversions.to_string(time(12, 34, 0), self.context), "12:34")
         self.assertEqual(conversions.to_string(self.tz.localize(datetime(2012, 3, 4, 5, 6, 7, 8)), self.context), "2012-03-04T05:06:07.000008+02:00")
@@ -215,6 +249,16 @@ class ConversionsTest(unittest.TestCase):
 
         self.assertEqual(conversions.to_time(self.tz.localize(datetime(2015, 8, 14, 9, 12, 0, 0)), self.context), time(9, 12, 0))
 
+    def test_to_same(self):
+        self.assertEqual(conversions.to_same("a", "b", self.context), ("a", "b"))
+        self.assertEqual(conversions.to_same(1, Decimal("2.5"), self.context), (Decimal(1), Decimal("2.5")))
+        self.assertEqual(conversions.to_same(True, 2, self.context), (Decimal(1), Decimal(2)))
+        self.assertEqual(conversions.to_same("3", 2, self.context), (Decimal(3), Decimal(2)))
+        self.assertEqual(conversions.to_same("14/8/15", date(2015, 8, 15), self.context),
+                         (self.tz.localize(datetime(2015, 8, 14)), self.tz.localize(datetime(2015, 8, 15))))
+        self.assertEqual(conversions.to_same("x", 2, self.context), ("x", "2"))
+        self.assertEqual(conversions.to_same(5, "NaN", self.context), ("5", "NaN"))
+
     def test_to_repr(self):
         self.assertEqual(conversions.to_repr(False, self.context), 'FALSE')
         self.assertEqual(conversions.to_repr(True, self.context), 'TRUE')
@@ -230,6 +274,22 @@ class ConversionsTest(unittest.TestCase):
 
 class EvaluationContextTest(unittest.TestCase):
 
+    def test_get_date_parser(self):
+        context = EvaluationContext()
+        parser = context.get_date_parser()
+
+        self.assertIs(context.get_date_parser(), parser)  # re-used whilst nothing changes
+        self.assertIs(EvaluationContext().get_date_parser(), parser)  # and shared with other contexts
+
+        context.date_style = DateStyle.MONTH_FIRST
+        self.assertIsNot(context.get_date_parser(), parser)
+
+    def test_get_date_format(self):
+        context = EvaluationContext(date_style=DateStyle.MONTH_FIRST)
+
+        self.assertEqual(context.get_date_format(False), "%m-%d-%Y")
+        self.assertEqual(context.get_date_format(True), "%m-%d-%Y %H:%M")
+
     def test_resolve_variable(self):
         contact = {
             "*": "Bob",
@@ -263,6 +323,12 @@ class EvaluationContextTest(unittest.TestCase):
         # no such item
         self.assertRaises(EvaluationError, context.resolve_variable, "bar")
 
+        # keys which aren't lowercase
+        context.put_variable("Flow", {"Color": "red"})
+        self.assertEqual(context.resolve_variable("flow.color"), "red")
+        self.assertEqual(context.resolve_variable("FLOW.Color"), "red")
+        self.assertRaises(EvaluationError, context.resolve_variable, "flow.size")
+
         context.put_variable("zed", ['x', 4])
 
         # container which is not a dict
@@ -279,6 +345,11 @@ class EvaluatorTest(unittest.TestCase):
         self.assertEqual(output, "Answer is 5")
         self.assertEqual(errors, [])
 
+        # with no expressions
+        output, errors = self.evaluator.evaluate_template("Answer is 5", EvaluationContext())
+        self.assertEqual(output, "Answer is 5")
+        self.assertEqual(errors, [])
+
         # with unbalanced expression
         output, errors = self.evaluator.evaluate_template("Answer is @(2 + 3", EvaluationContext())
         self.assertEqual(output, "Answer is @(2 + 3")
@@ -303,6 +374,21 @@ class EvaluatorTest(unittest.TestCase):
         output, errors = self.evaluator.evaluate_template("@(foo + contact.name + bar)", context, False, EvaluationStrategy.RESOLVE_AVAILABLE)
         self.assertEqual(output, "@(5+contact.name+\"x\")")
 
+    def test_evaluate_template_batch(self):
+        contexts = []
+        for foo, bar in ((5, "x"), (7, "y"), (None, "z")):
+            context = EvaluationContext()
+            context.put_variable("foo", foo)
+            context.put_variable("bar", bar)
+            contexts.append(context)
+
+        for template in ("@(1 + 2)", "Hi @contact.name", "@(foo + contact.name + bar)", "@(foo & bar) and @@foo"):
+            for strategy in EvaluationStrategy:
+                expected = [self.evaluator.evaluate_template(template, c, False, strategy) for c in contexts]
+                self.assertEqual(self.evaluator.evaluate_template_batch(template, contexts, False, strategy), expected)
+
+        self.assertEqual(self.evaluator.evaluate_template_batch("@(foo * 2)", contexts[:2]), [("10", []), ("14", [])])
+
     def test_evaluate_expression(self):
         context = EvaluationContext()
         context.put_variable("foo", 5)
@@ -357,6 +443,13 @@ class EvaluatorTest(unittest.TestCase):
         self.assertEqual(self.evaluator.evaluate_expression("now > (today - 1)", context), True)
         self.assertEqual(self.evaluator.evaluate_expression("now < (today - 1)", context), False)
 
+        # parsed expressions are shared between evaluations with different contexts
+        other_context = EvaluationContext()
+        other_context.put_variable("foo", 1)
+        other_context.put_variable("bar", 2)
+        self.assertEqual(self.evaluator.evaluate_expression("foo + bar", other_context), Decimal(3))
+        self.assertEqual(self.evaluator.evaluate_expression("foo + bar", context), Decimal(8))
+
         
 class FunctionsTest(unittest.TestCase):
     
@@ -371,9 +464,21 @@ class FunctionsTest(unittest.TestCase):
         
         self.assertEqual(manager.invoke_function(self.context, "foo", [12]), 24)
         self.assertEqual(manager.invoke_function(self.context, "FOO", [12]), 24)
+        self.assertEqual(manager.invoke_function(self.context, "Foo", [12]), 24)
         self.assertEqual(manager.invoke_function(self.context, "bar", [12, 5]), 17)
         self.assertEqual(manager.invoke_function(self.context, "bar", [12]), 14)
         self.assertEqual(manager.invoke_function(self.context, "doh", [12, 1, 2, 3]), 36)
+        self.assertEqual(manager.invoke_function(self.context, "doh", [12]), 0)
+        self.assertEqual(manager.invoke_function(self.context, "qux", [2]), 6)
+        self.assertEqual(manager.invoke_function(self.context, "qux", [2, 4]), 8)
+
+        # wrong number of arguments
+        self.assertRaises(EvaluationError, manager.invoke_function, self.context, "foo", [])
+        self.assertRaises(EvaluationError, manager.invoke_function, self.context, "bar", [12, 5, 1])
+
+        self.assertEqual(manager.get_function("BAR"), _bar)
+        self.assertEqual(manager.get_function("Bar"), _bar)
+        self.assertIsNone(manager.get_function("xxx"))
 
         # can't invoke a "private" function
         self.assertRaises(EvaluationError, manager.invoke_function, self.context, "zed", [12])
@@ -384,8 +489,7 @@ class FunctionsTest(unittest.TestCase):
     def test_build_listing(self):
         listing = DEFAULT_FUNCTION_MANAGER.build_listing()
 
-        def by_name(name):
-            return next(filter(lambda f: f['name'] == name, listing), None)
+        by_name = {f['name']: f for f in listing}.get
 
         # check function with no params
         self.assertEqual(by_name('NOW'), {'name': 'NOW',
@@ -407,6 +511,13 @@ class FunctionsTest(unittest.TestCase):
         self.assertEqual(by_name('SUM'), {'name': 'SUM',
                                           'description': "Returns the sum of all arguments",
                                           'params': [{'name': 'number', 'optional': False, 'vararg': True}]})
+
+        # listing includes functions from libraries added later
+        manager = FunctionManager()
+        manager.add_library(excel)
+        excel_listing = manager.build_listing()
+        manager.add_library(custom)
+        self.assertGreater(len(manager.build_listing()), len(excel_listing))
     
     def test_excel(self):
         # text functions
@@ -417,6 +528,7 @@ class FunctionsTest(unittest.TestCase):
         self.assertEqual(excel.char(self.context, 65), 'A')
 
         self.assertEqual(excel.clean(self.context, 'Hello \nwo\trl\rd'), 'Hello world')
+        self.assertEqual(excel.clean(self.context, 'Héllo \nwo\trl\rd'), 'Héllo world')
 
         self.assertEqual(excel.code(self.context, '\t'), 9)
         self.assertEqual(excel.code(self.context, '\n'), 10)
@@ -463,6 +575,8 @@ class FunctionsTest(unittest.TestCase):
         self.assertEqual(excel.substitute(self.context, 'hello Hello world', 'hello', 'bonjour'), 'bonjour Hello world')  # case-sensitive
         self.assertEqual(excel.substitute(self.context, 'hello hello world', 'hello', 'bonjour'), 'bonjour bonjour world')  # all instances
         self.assertEqual(excel.substitute(self.context, 'hello hello world', 'hello', 'bonjour', 2), 'hello bonjour world')  # specific instance
+        self.assertEqual(excel.substitute(self.context, 'hello hello world', 'hello', 'bonjour', Decimal(1)), 'bonjour hello world')
+        self.assertEqual(excel.substitute(self.context, 'hello hello world', 'hello', 'bonjour', 3), 'hello hello world')  # no such instance
         self.assertEqual(excel.substitute(self.context, 'واحد إثنان ثلاثة', 'واحد', 'إثنان'), 'إثنان إثنان ثلاثة')
 
         self.assertEqual(excel.unichar(self.context, 65), 'A')
@@ -561,6 +675,9 @@ class FunctionsTest(unittest.TestCase):
         self.assertEqual(excel._round(self.context, '626.3', '-3'), Decimal(1000))
         self.assertEqual(excel._round(self.context, '1.98', '-1'), Decimal(0))
         self.assertEqual(excel._round(self.context, '-50.55', '-2'), Decimal(-100))
+        self.assertEqual(str(excel._round(self.context, Decimal('1234.5678'), -2)), '1200')  # no exponent notation
+        self.assertEqual(str(excel._round(self.context, Decimal('99'), -3)), '0')
+        self.assertEqual(str(excel.roundup(self.context, Decimal('0.001'), -2)), '100')
 
         self.assertEqual(excel.rounddown(self.context, '3.2', 0), Decimal('3'))
         self.assertEqual(excel.rounddown(self.context, '76.9', 0), Decimal('76'))
@@ -663,6 +780,7 @@ class FunctionsTest(unittest.TestCase):
         self.assertEqual('abc def', custom.word_slice(self.context, ' abc  def ghi-jkl ', 1, 3))
         self.assertEqual('ghi jkl', custom.word_slice(self.context, ' abc  def ghi-jkl ', 3, 0))
         self.assertEqual('ghi-jkl', custom.word_slice(self.context, ' abc  def ghi-jkl ', 3, 0, True))
+        self.assertEqual('abc def', custom.word_slice(self.context, ' abc  def ghi-jkl ', 1, 3, True))
         self.assertEqual('ghi jkl', custom.word_slice(self.context, ' abc  def ghi-jkl ', '3', '0', 'false'))  # string args only
         self.assertEqual('ghi jkl', custom.word_slice(self.context, ' abc  def ghi-jkl ', 3))
         self.assertEqual('def ghi', custom.word_slice(self.context, ' abc  def ghi-jkl ', 2, -1))
@@ -693,12 +811,11 @@ class TemplateTest(unittest.TestCase):
         with codecs.open('test_files/template_tests.json', 'r', 'utf-8') as tests_file:
             tests_json = json_strip_comments(tests_file.read())
             tests_json = json.loads(tests_json, parse_float=Decimal)
-            tests = []
-            for test_json in tests_json:
-                tests.append(TemplateTest.TestDefinition(test_json))
+            contexts = {}  # evaluation doesn't modify contexts, so tests with identical contexts can share them
+            tests = [TemplateTest.TestDefinition(test_json, contexts) for test_json in tests_json]
 
         failures = []
-        start = int(round(clock() * 1000))
+        start = perf_counter_ns()
 
         for test in tests:
             try:
@@ -708,7 +825,7 @@ class TemplateTest(unittest.TestCase):
                 print("Exception whilst evaluating: %s" % test.template)
                 raise e
 
-        duration = int(round(clock() * 1000)) - start
+        duration = (perf_counter_ns() - start) // 1000000
 
         print("Completed %d template tests in %dms (failures=%d)" % (len(tests), duration, len(failures)))
 
@@ -729,13 +846,20 @@ class TemplateTest(unittest.TestCase):
             self.fail("There were failures in the template tests")  # fail unit test if there were any errors
 
     class TestDefinition(object):
+        __slots__ = ('template', 'context', 'url_encode', 'expected_output', 'expected_output_regex',
+                     'expected_output_pattern', 'expected_errors', 'actual_output', 'actual_errors')
+
+        def __init__(self, json_obj, contexts):
+            context_key = json.dumps(json_obj['context'], sort_keys=True, default=lambda v: ['__repr__', repr(v)])
+            if context_key not in contexts:
+                contexts[context_key] = EvaluationContext.from_json(json_obj['context'])
 
-        def __init__(self, json_obj):
             self.template = json_obj['template']
-            self.context = EvaluationContext.from_json(json_obj['context'])
+            self.context = contexts[context_key]
             self.url_encode = json_obj['url_encode']
             self.expected_output = json_obj.get('output', None)
             self.expected_output_regex = json_obj.get('output_regex', None)
+            self.expected_output_pattern = regex.compile(self.expected_output_regex) if self.expected_output_regex else None
             self.expected_errors = json_obj['errors']
 
             self.actual_output = None
@@ -750,7 +874,7 @@ class TemplateTest(unittest.TestCase):
                 if self.expected_output != self.actual_output:
                     return False
             else:
-                if not regex.compile(self.expected_output_regex).fullmatch(self.actual_output):
+                if not self.expected_output_pattern.fullmatch(self.actual_output):
                     return False
 
             return self.expected_errors == self.actual_errors
@@ -761,6 +885,7 @@ class UtilsTest(unittest.TestCase):
     def test_urlquote(self):
         self.assertEqual(urlquote(""), "")
         self.assertEqual(urlquote("?!=Jow&Flow"), "%3F%21%3DJow%26Flow")
+        self.assertEqual(urlquote("a/b é"), "a/b%20%C3%A9")  # slashes are safe, like Django's urlquote
 
     def test_decimal_pow(self):
         self.assertEqual(decimal_pow(Decimal(4), Decimal(2)), Decimal(16))
@@ -775,6 +900,9 @@ class UtilsTest(unittest.TestCase):
         self.assertEqual(tokenize("öne.βήταa.thé"), ["öne", "βήταa", "thé"])                               # non-latin letters allowed in tokens
         self.assertEqual(tokenize("واحد اثنين ثلاثة"), ["واحد", "اثنين", "ثلاثة"])                           # RTL scripts
         self.assertEqual(tokenize("  \t\none(two!*@three "), ["one", "two", "three"])                      # other punctuation ignored
+        self.assertEqual(tokenize("1+2=3 $5 ~x|y"), ["1", "+", "2", "=", "3", "$", "5", "~", "x", "|", "y"])           # ASCII symbols are tokens
+        self.assertEqual(tokenize("1+2=3 $5 é"), ["1", "+", "2", "=", "3", "$", "5", "é"])
+        self.assertEqual(tokenize("£5 café×½ ¿sí?"), ["£", "5", "café", "×", "½", "sí"])                     # Latin-1 text
         self.assertEqual(tokenize("spend$£€₠₣₪"), ["spend", "$", "£", "€", "₠", "₣", "₪"])                 # currency symbols treated as individual tokens
         self.assertEqual(tokenize("math+=×÷√∊"), ["math", "+", "=", "×", "÷", "√", "∊"])                   # math symbols treated as individual tokens
         self.assertEqual(tokenize("emoji😄🏥👪👰😟🧟"), ["emoji", "😄", "🏥", "👪", "👰", "😟", "🧟"])  # emojis treated as individual tokens
@@ -784,33 +912,44 @@ class UtilsTest(unittest.TestCase):
         self.assertEqual(tokenize("বাতিল sasa"), ["বাতিল", "sasa"])                                         # Bangla word means Cancel
         self.assertEqual(tokenize("ထွက်သွား sasa"), ["ထွက်သွား", "sasa"])                                    # Burmese word means exit
 
+        # tokens are memoized but callers still get their own list
+        tokens = tokenize("one two")
+        tokens.append("three")
+        self.assertEqual(tokenize("one two"), ["one", "two"])
+
     def test_parse_json_date(self):
         val = datetime(2014, 10, 3, 1, 41, 12, 790000, pytz.UTC)
 
         self.assertEqual(parse_json_date(None), None)
         self.assertEqual(parse_json_date("2014-10-03T01:41:12.790Z"), val)
+        self.assertEqual(parse_json_date("2014-10-03T01:41:12.790000Z"), val)
+        self.assertEqual(parse_json_date("2014-10-03T01:41:12.79Z"), val)
+        self.assertRaises(ValueError, parse_json_date, "2014-10-03T01:41:12.790")
+        self.assertRaises(ValueError, parse_json_date, "2014-13-03T01:41:12.790Z")
+        self.assertRaises(ValueError, parse_json_date, "2014-W41-5T01:41:12.790Z")  # ISO week dates aren't allowed
 
     def test_format_json_date(self):
         val = datetime(2014, 10, 3, 1, 41, 12, 790000, pytz.UTC)
 
         self.assertEqual(format_json_date(None), None)
         self.assertEqual(format_json_date(val), "2014-10-03T01:41:12.790Z")
+        self.assertEqual(format_json_date(datetime(2014, 10, 3, 1, 41, 12, 5999, pytz.UTC)), "2014-10-03T01:41:12.005Z")
+        self.assertEqual(format_json_date(pytz.timezone("Africa/Kigali").localize(datetime(2014, 10, 3, 1, 41, 12))),
+                         "2014-10-02T23:41:12.000Z")
 
 
 #
 # Testing utility methods
 #
 
+JSON_COMMENT_REGEX = regex.compile(r'/\*.*?\*/', regex.DOTALL | regex.UNICODE)
+
+
 def json_strip_comments(text):
     """
     Strips /* ... */ style comments from JSON
     """
-    pattern = regex.compile(r'/\*[^\*]+\*/', regex.DOTALL|regex.MULTILINE|regex.UNICODE)
-    match = pattern.search(text)
-    while match:
-        text = text[:match.start()] + text[match.end():]
-        match = pattern.search(text)
-    return text
+    return JSON_COMMENT_REGEX.sub('', text)
 
 
 #
@@ -829,5 +968,9 @@ def doh(a, *args):
     return len(args) * a
 
 
+def qux(a, ctx, b=3):
+    return a * b
+
+
 def __zed(a):
     return a / 2
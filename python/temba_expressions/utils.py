@@ -1,17 +1,50 @@
 import datetime
 import math
 import pytz
+import re
 import regex
+import unicodedata
 
 from decimal import Decimal, ROUND_HALF_UP
-from six.moves.urllib.parse import quote
+from functools import lru_cache
+from urllib.parse import quote
 
 JSON_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
 
+# JSON datetimes with exactly millisecond precision, as written by format_json_date
+JSON_DATETIME_MILLIS_REGEX = re.compile(r'\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}Z', flags=re.ASCII)
+
+# shared decimal constants, safe to share as decimals are immutable
+DECIMAL_ZERO = Decimal(0)
+DECIMAL_ONE = Decimal(1)
+DECIMAL_HUNDRED = Decimal(100)
+
+# quantums for rounding to the usual numbers of decimal places, e.g. 2 -> 0.01
+DECIMAL_QUANTA = {num_digits: Decimal(10) ** -num_digits for num_digits in range(21)}
+
 # treats sequences of letters/numbers/_/' as tokens, and symbols as individual tokens
 WORD_TOKEN_REGEX = regex.compile(r"[\p{M}\p{L}\p{N}_']+|\pS", flags=regex.UNICODE | regex.V0)
 
 
+def _build_latin1_word_token_regex():
+    """
+    Builds the equivalent of WORD_TOKEN_REGEX for text which only contains Latin-1 characters, by listing the
+    characters in those classes explicitly so that it can be matched by stdlib re
+    """
+    word_chars, symbol_chars = ["_'"], []
+    for ch in map(chr, range(256)):
+        category = unicodedata.category(ch)[0]
+        if category in ('M', 'L', 'N'):
+            word_chars.append(ch)
+        elif category == 'S':
+            symbol_chars.append(ch)
+
+    return re.compile('[%s]+|[%s]' % (re.escape(''.join(word_chars)), re.escape(''.join(symbol_chars))))
+
+
+LATIN1_WORD_TOKEN_REGEX = _build_latin1_word_token_regex()
+
+
 def decimal_pow(number, power):
     """
     Pow for two decimals
@@ -23,11 +56,14 @@ def decimal_round(number, num_digits, rounding=ROUND_HALF_UP):
     """
     Rounding for decimals with support for negative digits
     """
-    exp = Decimal(10) ** -num_digits
-
     if num_digits >= 0:
-        return number.quantize(exp, rounding)
+        quantum = DECIMAL_QUANTA.get(num_digits)
+        if quantum is None:
+            quantum = Decimal(10) ** -num_digits
+
+        return number.quantize(quantum, rounding)
     else:
+        exp = Decimal(10) ** -num_digits
         return exp * (number / exp).to_integral_value(rounding)
 
 
@@ -43,8 +79,27 @@ def urlquote(text):
 def tokenize(text):
     """
     Tokenizes a string by splitting on non-word characters.
+    :param text: the text to tokenize
+    """
+    return list(_tokenize_all(text))
+
+
+@lru_cache(maxsize=1024)
+def _tokenize_all(text):
+    """
+    Tokenizes an entire string, memoized as the word functions are often called repeatedly on the same text
     """
-    return WORD_TOKEN_REGEX.findall(text)
+    return tuple(_get_word_token_regex(text).findall(text))
+
+
+def _get_word_token_regex(text):
+    """
+    Gets the pattern to tokenize the given text with. Most text is ASCII or Latin-1 which stdlib re can tokenize much
+    faster than the regex module.
+    """
+    if text.isascii() or max(text) <= '\xff':
+        return LATIN1_WORD_TOKEN_REGEX
+    return WORD_TOKEN_REGEX
 
 
 def parse_json_date(value):
@@ -54,6 +109,14 @@ def parse_json_date(value):
     if not value:
         return None
 
+    # values are usually formatted by format_json_date with millisecond precision, e.g. "2014-10-03T09:41:12.790Z", so
+    # we can skip the slower strptime for those
+    if JSON_DATETIME_MILLIS_REGEX.fullmatch(value):
+        try:
+            return datetime.datetime.fromisoformat(value[:23]).replace(tzinfo=pytz.UTC)
+        except ValueError:
+            pass
+
     return datetime.datetime.strptime(value, JSON_DATETIME_FORMAT).replace(tzinfo=pytz.UTC)
 
 
@@ -64,9 +127,10 @@ def format_json_date(value):
     if not value:
         return None
 
-    # %f will include 6 microsecond digits
-    micro_precision = value.astimezone(pytz.UTC).strftime(JSON_DATETIME_FORMAT)
+    if value.tzinfo is not pytz.UTC:
+        value = value.astimezone(pytz.UTC)
 
-    # only keep the milliseconds portion of the second fraction
-    return micro_precision[:-4] + 'Z'
+    # formatting the fields directly is quicker than strftime, and lets us only include milliseconds
+    return '%04d-%02d-%02dT%02d:%02d:%02d.%03dZ' % (value.year, value.month, value.day,
+                                                   value.hour, value.minute, value.second, value.microsecond // 1000)
 